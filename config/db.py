@@ -7,3 +7,11 @@ host = os.environ.get('PG_LOC_DB_HOST', 'localhost')
 port = os.environ.get('PG_LOC_DB_PORT', '5432')
 
 DATABASE_URL = f"postgresql+psycopg://{user}:{pw}@{host}:{port}/{db}"
+
+# Connection pool and statement caching settings
+pool_size = int(os.environ.get('PG_LOC_DB_POOL_SIZE', '5'))
+max_overflow = int(os.environ.get('PG_LOC_DB_MAX_OVERFLOW', '5'))
+pool_pre_ping = os.environ.get('PG_LOC_DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes') # check connection before use
+pool_recycle = int(os.environ.get('PG_LOC_DB_POOL_RECYCLE', '1800')) # seconds
+query_cache_size = int(os.environ.get('PG_LOC_DB_QUERY_CACHE_SIZE', '500')) # SQLAlchemy compiled statement cache
+prepare_threshold = int(os.environ.get('PG_LOC_DB_PREPARE_THRESHOLD', '5')) # psycopg server-side prepared statements (after N executions)
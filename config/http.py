@@ -0,0 +1,6 @@
+import os
+
+# Connection pool (per host) and keep-alive settings
+pool_connections = int(os.environ.get('KV_HTTP_POOL_CONNECTIONS', '4')) # number of hosts to keep pools for
+pool_maxsize = int(os.environ.get('KV_HTTP_POOL_MAXSIZE', '10')) # connections kept alive per host
+pool_block = os.environ.get('KV_HTTP_POOL_BLOCK', 'true').lower() in ('1', 'true', 'yes') # wait for free connection instead of opening extra ones
@@ -1,59 +1,168 @@
-from utils import logger, storage
-from config.db import DATABASE_URL
-from utils.db import DatabaseManager
-from spider.kvspider import KVSpider
+import argparse
+from pathlib import Path
+from utils import logger
+from typing import List, Optional
 from contextlib import contextmanager
 
 
+# Heavy subsystems (SQLAlchemy, lxml, requests) are imported inside subcommands,
+# so short jobs (e.g. 'compact') load only what they need
 log = logger.setup_logger()
 
 
 @contextmanager
-def create_spider(db_manager: DatabaseManager | None):
-    spider = KVSpider(db_manager)
+def create_spider(db_manager, stages=(), chunk_size=None):
+    from utils import http, pipeline
+    from spider.kvspider import KVSpider
 
-    def save_apartments() -> None:
-        if hasattr(spider, 'apartments') and spider.apartments:
-            log.info(f"Saving {len(spider.apartments)} apartments...")
-
-            # Save to JSON
-            storage.save_to_json(spider.apartments)
-
-            # Save to Database (if database is connected)
-            if spider.db_manager:
-                spider.db_manager.save_apartments(spider.apartments)
+    spider = KVSpider(db_manager, stages=stages, chunk_size=pipeline.PIPELINE_CHUNK_SIZE if chunk_size is None else chunk_size)
 
+    # Records collected before an error are already saved by the pipeline (see utils.pipeline.run)
     try:
         yield spider
     except KeyboardInterrupt:
         log.info("Interrupted by user.")
-        save_apartments()
     except Exception as e:
         log.error(f"Fatal error: {e}")
-        save_apartments()
     finally:
         if hasattr(spider, 'session'):
+            log.info(f"HTTP connection stats: {http.connection_stats(spider.session)}")
             spider.session.close()
             log.info("Session closed!")
 
+        if spider.db_manager:
+            log.info(f"Database connection stats: {spider.db_manager.pool_stats()}")
+            spider.db_manager.close()
 
-def main():
-    log.info("Apartment scraping process started.")
-
+def connect_db():
     try:
         log.info("Preparing database...")
+        from config.db import DATABASE_URL
+        from utils.db import DatabaseManager
+
         db_manager = DatabaseManager(DATABASE_URL)
         db_manager.init_db()
         log.info("Database ready.")
+        return db_manager
     except Exception:
         log.error("Failed to initialize database. Continuing without database support.")
-        db_manager = None
+        return None
 
-    with create_spider(db_manager) as spider:
-        spider.run_scraper()
+
+# Subcommands
+def crawl(args: argparse.Namespace) -> None:
+    from utils import pipeline
+
+    log.info("Apartment scraping process started.")
+
+    db_manager = None if args.no_db else connect_db()
+    stages = [pipeline.require_fields(*args.require)] if args.require else []
+    with create_spider(db_manager, stages=stages, chunk_size=args.chunk_size) as spider:
+        spider.run_scraper(start_url=args.url)
 
     log.info("Apartment scraping process ended.")
 
+def reparse(args: argparse.Namespace) -> None:
+    from utils import parser, storage
+
+    data_files = storage.list_data_files()
+    log.info(f"Reparsing {len(data_files)} JSON files into {storage.REPARSED_DIR}...")
+
+    # Output goes to 'data/reparsed' (raw scraped data stays untouched), use 'export --source reparsed' to export it
+    storage.REPARSED_DIR.mkdir(parents=True, exist_ok=True)
+    for file_path in data_files:
+        apartments = (parser.reparse_apartment(apt) for apt in storage.iter_json_file(file_path))
+        count = storage.write_jsonl(storage.REPARSED_DIR / f'{file_path.stem}.jsonl', apartments)
+        log.debug(f"Reparsed {count} apartments from {file_path}")
+
+    log.info("Reparse ended.")
+
+def export(args: argparse.Namespace) -> None:
+    from utils import export as exporter
+
+    db_manager = connect_db() if args.source == 'db' else None
+    if args.source == 'db' and db_manager is None:
+        log.error("Database is not available. Use '--source json' to export stored JSON files.")
+        return
+
+    try:
+        exporter.export_apartments(
+            source=args.source
+            , fmt=args.format
+            , output_dir=exporter.EXPORT_DIR if args.output is None else Path(args.output)
+            , incremental=not args.full
+            , chunk_size=exporter.EXPORT_CHUNK_SIZE if args.chunk_size is None else args.chunk_size
+            , db_manager=db_manager
+        )
+    finally:
+        if db_manager:
+            db_manager.close()
+
+def compact(args: argparse.Namespace) -> None:
+    from utils import storage
+
+    storage.compact_json_files()
+
+def migrate_images(args: argparse.Namespace) -> None:
+    db_manager = connect_db()
+    if db_manager is None:
+        log.error("Database is not available. Legacy images were not migrated.")
+        return
+
+    try:
+        db_manager.migrate_legacy_images()
+    finally:
+        db_manager.close()
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+def build_parser() -> argparse.ArgumentParser:
+    from utils.export import RECORD_FIELDS # standard library only, keeps startup fast
+
+    arg_parser = argparse.ArgumentParser(description="KV.ee apartment parser")
+    subparsers = arg_parser.add_subparsers(dest='command')
+
+    crawl_parser = subparsers.add_parser('crawl', help="scrape apartments (default)")
+    crawl_parser.add_argument('--url', default=None, help="initial search URL (skips prompt)")
+    crawl_parser.add_argument('--no-db', action='store_true', help="save only to JSON files")
+    crawl_parser.add_argument('--require', action='append', choices=RECORD_FIELDS, metavar='FIELD', help=f"skip apartments without given field (repeatable), one of: {', '.join(RECORD_FIELDS)}")
+    crawl_parser.add_argument('--chunk-size', type=positive_int, default=None, help="apartments kept in memory before saving (default 50)")
+    crawl_parser.set_defaults(func=crawl)
+
+    reparse_parser = subparsers.add_parser('reparse', help="re-derive address fields of stored JSON files into 'data/reparsed'")
+    reparse_parser.set_defaults(func=reparse)
+
+    export_parser = subparsers.add_parser('export', help="export apartments to partitioned Parquet/CSV files")
+    export_parser.add_argument('--source', choices=['db', 'json', 'reparsed'], default='db', help="read from database, JSON/JSONL files in 'data' or 'reparse' output in 'data/reparsed'")
+    export_parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet', help="output format (CSV is used if 'pyarrow' is missing)")
+    export_parser.add_argument('--output', default=None, help="output directory (default: utils.export.EXPORT_DIR, project root 'export')")
+    export_parser.add_argument('--full', action='store_true', help="ignore 'updated_at' watermark and export all rows")
+    export_parser.add_argument('--chunk-size', type=positive_int, default=None, help="rows kept in memory at once (default: utils.export.EXPORT_CHUNK_SIZE)")
+    export_parser.set_defaults(func=export)
+
+    compact_parser = subparsers.add_parser('compact', help="combine JSON files into one")
+    compact_parser.set_defaults(func=compact)
+
+    migrate_images_parser = subparsers.add_parser('migrate-images', help="move legacy database 'images' table into deduplicated image tables")
+    migrate_images_parser.set_defaults(func=migrate_images)
+
+    return arg_parser
+
+def main(argv: Optional[List[str]] = None) -> None:
+    arg_parser = build_parser()
+    args = arg_parser.parse_args(argv)
+
+    # Plain 'python main.py' keeps old behaviour (crawl)
+    if args.command is None:
+        args = arg_parser.parse_args(['crawl'])
+
+    args.func(args)
+
 
 if __name__ == "__main__":
     main()
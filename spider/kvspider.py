@@ -2,22 +2,35 @@ import time
 import logging
 from lxml import html
 from config import xpaths
-from utils.db import DatabaseManager
-from utils import http, parser, storage
-from typing import List, Dict, Any, Optional, Tuple
+from utils import http, parser, pipeline, storage
+from typing import List, Dict, Any, Optional, Iterator, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from utils.db import DatabaseManager # only for type hints (crawl without database doesn't load SQLAlchemy)
 
 
 class KVSpider:
-    def __init__(self, db_manager: DatabaseManager | None):
+    def __init__(self, db_manager: 'DatabaseManager | None', stages: Sequence[pipeline.Stage] = (), chunk_size: int = pipeline.PIPELINE_CHUNK_SIZE):
         self.session = http.create_session()
         self.db_manager = db_manager
-        self.apartments: List[Dict[str, Any]] = []
+
+        # Record flow: process_apartments (generator) -> stages -> sinks (in 'chunk_size' chunks)
+        self.stages = list(stages)
+        self.chunk_size = chunk_size
+        self.sinks: List[pipeline.Sink] = [storage.save_to_json]
+        if self.db_manager:
+            self.sinks.append(self.db_manager.save_apartments)
+
+        # Counters of current page (filled while process_apartments is consumed)
+        self.processed_count = 0
+        self.exists_in_db_count = 0
+        self.failed_cnt = 0
 
 
     # Main function
-    def run_scraper(self) -> None:
-        # Get initial url
-        current_page_url = http.get_initial_url()
+    def run_scraper(self, start_url: Optional[str] = None) -> None:
+        # Get initial url (asks user if not provided)
+        current_page_url = http.get_initial_url(start_url)
 
         # While there are url to scrape - scraper will work
         current_page_nr = 1
@@ -39,21 +52,9 @@ class KVSpider:
             return None # at this moment the whole process will be terminated
 
         # Process apartments on current page
-        processed_count, exists_in_db_count, failed_cnt = self.process_apartments(html, page_number)
-        logging.info(f"Total processed: {processed_count} / skipped: {exists_in_db_count} / failed: {failed_cnt} apartments from page {page_number}: {url}")
-
-
-        # Save processed apartments from current page (if there is any)
-        if self.apartments:
-            logging.info(f"Saving {len(self.apartments)} apartments...")
-
-            # Save to both JSON and database (if available)
-            storage.save_to_json(self.apartments)
-
-            if self.db_manager:
-                self.db_manager.save_apartments(self.apartments)
-
-            self.apartments.clear()
+        # Records are streamed to JSON and database (if available) in chunks, so memory stays bounded
+        saved_count = pipeline.run(self.process_apartments(html, page_number), self.sinks, self.stages, self.chunk_size)
+        logging.info(f"Total processed: {self.processed_count} / skipped: {self.exists_in_db_count} / failed: {self.failed_cnt} / saved: {saved_count} apartments from page {page_number}: {url}")
 
         logging.info(f"{'-'*100}")
 
@@ -61,23 +62,23 @@ class KVSpider:
         next_page_url = self._get_next_page_url(html, xpaths.NEXT_URL)
         return http.generate_url(relative_url=next_page_url) if next_page_url else None
 
-    def process_apartments(self, html: html.HtmlElement, page_number: int) -> Tuple[int, int, int]:
-        # Counters
-        processed_count = 0
-        exists_in_db_count = 0
-        failed_cnt = 0
+    def process_apartments(self, html: html.HtmlElement, page_number: int) -> Iterator[Dict[str, Any]]:
+        # Reset page counters
+        self.processed_count = 0
+        self.exists_in_db_count = 0
+        self.failed_cnt = 0
 
         # Extract apartment URLs from provided HTML
         apartments_urls = self._get_apartments_urls(html, xpaths.APARTMENTS_URLS_LIST)
 
         if apartments_urls is None:
             logging.warning("No apartments URLs found.")
-            return processed_count, exists_in_db_count, failed_cnt # will be 0
+            return # counters will be 0
         logging.info(f"Found {len(apartments_urls)} apartment URLs on page {page_number}") # by default 50 apartments per page
 
         # Process each apartment URL
         for idx, apartment_url in enumerate(apartments_urls, start=1):
-            logging.info(f"At the moment processed: {processed_count} / skipped: {exists_in_db_count} / failed: {failed_cnt}")
+            logging.info(f"At the moment processed: {self.processed_count} / skipped: {self.exists_in_db_count} / failed: {self.failed_cnt}")
 
             full_url = http.generate_url(relative_url=apartment_url)
             logging.info(f"Processing apartment [{idx}/{len(apartments_urls)}] on page {page_number}. Apartment URL: {full_url}")
@@ -87,37 +88,34 @@ class KVSpider:
             if self.db_manager is not None and self.db_manager.check_apartment_exists(full_url):
                 logging.info("Apartment already exists in database. Status: SKIPPED.")
                 time.sleep(0.5)
-                exists_in_db_count += 1
+                self.exists_in_db_count += 1
                 continue
 
             # Process apartment
-            # We will send request, parse then clean response and store result in self.apartments list
+            # We will send request, parse then clean response and yield result to the pipeline
             # The result will be dictionary with scraped data about specific apartment
-            if self.process_single_apartment(full_url):
-                logging.info("Successfully processed! Status: OK.")
-                processed_count += 1
-            else:
-                failed_cnt += 1
+            apartment = self.process_single_apartment(full_url)
+            if apartment is None:
+                self.failed_cnt += 1
+                continue
 
-        return processed_count, exists_in_db_count, failed_cnt
+            logging.info("Successfully processed! Status: OK.")
+            self.processed_count += 1
+            yield apartment
 
-    def process_single_apartment(self, apartment_full_url: str) -> bool:
+    def process_single_apartment(self, apartment_full_url: str) -> Optional[Dict[str, Any]]:
         try:
             # Send and parse
             apartment_html = self._fetch_and_parse(apartment_full_url)
             if apartment_html is None:
                 logging.error(f"Failed to fetch apartment page: {apartment_full_url}. Status: FAILED.")
-                return False
+                return None
 
             # Extract apartment data (returns dictionary)
-            apartment = parser.extract_apartment_data(apartment_html, apartment_full_url)
-
-            # Append parsed apartment data to the list
-            self.apartments.append(apartment)
-            return True
+            return parser.extract_apartment_data(apartment_html, apartment_full_url)
         except Exception as e:
             logging.error(f"Error processing apartment: {e}. URL: {apartment_full_url}")
-            return False
+            return None
 
 
     # Function helpers
@@ -1,17 +1,24 @@
 import logging
+import hashlib
 from sqlalchemy.sql import func
-from typing import List, Dict, Any
-from sqlalchemy.schema import CreateSchema
-from sqlalchemy import create_engine, inspect
+from config import db as db_config
+from utils import images as image_utils
+from typing import List, Dict, Any, Tuple, Iterable, Optional
+from sqlalchemy.schema import CreateSchema, CreateTable
+from sqlalchemy.dialects import postgresql
+from sqlalchemy import create_engine, inspect, text, select, delete, event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, ForeignKey, TIMESTAMP
 
 
 SCHEMA_NAME = 'kv_apartments'
+LEGACY_IMAGES_TABLE = 'images' # one row per apartment/image pair (before image dedupe)
+LEGACY_MIGRATION_CHUNK = 10_000
 
 
-# Database SQLAlchemy Models (ApartmentDB and ImageDB)
+# Database SQLAlchemy Models (ApartmentDB, ImageDB and ApartmentImageDB)
 Base = declarative_base()
 class ApartmentDB(Base):
     __tablename__ = 'apartments'
@@ -44,39 +51,99 @@ class ApartmentDB(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
-    # Relationships
-    images = relationship("ImageDB", back_populates="apartment")
+    # Relationships (read-only, links are written in bulk by DatabaseManager)
+    images = relationship(
+        "ImageDB"
+        , secondary=f'{SCHEMA_NAME}.apartment_images'
+        , order_by="ApartmentImageDB.position"
+        , viewonly=True
+    )
 class ImageDB(Base):
-    __tablename__ = 'images'
+    # Every canonical image URL is stored only once (keyed by URL hash)
+    __tablename__ = 'image_urls'
     __table_args__ = {'schema': SCHEMA_NAME}
 
     # Fields
-    id = Column(Integer, primary_key=True)
-    apartment_id = Column(Integer, ForeignKey(f'{SCHEMA_NAME}.apartments.apartment_id'))
-    image = Column(String)
+    image_id = Column(BigInteger, primary_key=True, autoincrement=False) # utils.images.image_hash(image)
+    image = Column(String, nullable=False)
 
     # Meta fields
     created_at = Column(TIMESTAMP, server_default=func.now())
-    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+class ApartmentImageDB(Base):
+    # Compact join table between apartments and deduplicated images
+    __tablename__ = 'apartment_images'
+    __table_args__ = {'schema': SCHEMA_NAME}
+
+    # Fields
+    apartment_id = Column(Integer, ForeignKey(f'{SCHEMA_NAME}.apartments.apartment_id'), primary_key=True)
+    image_id = Column(BigInteger, ForeignKey(f'{SCHEMA_NAME}.image_urls.image_id'), primary_key=True)
+    position = Column(SmallInteger) # image order on the listing page
+class SchemaFingerprintDB(Base):
+    # Marker row, lets init_db() skip schema inspection when models haven't changed
+    __tablename__ = 'schema_fingerprint'
+    __table_args__ = {'schema': SCHEMA_NAME}
+
+    # Fields
+    fingerprint = Column(String(64), primary_key=True) # schema_fingerprint() of models that created the schema
+
+    # Meta fields
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
 
-    # Relationship
-    apartment = relationship("ApartmentDB", back_populates="images")
+def schema_fingerprint() -> str:
+    """SHA-256 of models' CREATE TABLE DDL, changes whenever any model changes."""
+    dialect = postgresql.dialect()
+    ddl = '\n'.join(str(CreateTable(table).compile(dialect=dialect)) for table in Base.metadata.sorted_tables)
+    return hashlib.sha256(ddl.encode('utf-8')).hexdigest()
 
 
 # Database Operations Manager
 class DatabaseManager:
     def __init__(self, connection_string: str):
-        self.engine = create_engine(connection_string)
+        self.engine = create_engine(
+            connection_string
+            , pool_size=db_config.pool_size
+            , max_overflow=db_config.max_overflow
+            , pool_pre_ping=db_config.pool_pre_ping
+            , pool_recycle=db_config.pool_recycle
+            , query_cache_size=db_config.query_cache_size
+            , connect_args={'prepare_threshold': db_config.prepare_threshold}
+        )
         self.Session = sessionmaker(bind=self.engine)
         self._session = None
 
+        # Connection pool stats (checkouts vs new DBAPI connections)
+        self._pool_counters = {'checkouts': 0, 'connections': 0}
+        event.listen(self.engine, 'connect', lambda *_: self._count('connections'))
+        event.listen(self.engine, 'checkout', lambda *_: self._count('checkouts'))
+
     @property
     def session(self):
         if self._session is None:
             self._session = self.Session()
         return self._session
 
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection reuse stats of engine pool (checkouts vs new connections opened)."""
+        checkouts = self._pool_counters['checkouts']
+        connections = self._pool_counters['connections']
+        reuse_rate = 1 - connections / checkouts if checkouts else 0.0
+        return {'checkouts': checkouts, 'connections': connections, 'reuse_rate': round(reuse_rate, 3), 'pool': self.engine.pool.status()}
+
+    def close(self) -> None:
+        if self._session:
+            self._session.close()
+            self._session = None
+        self.engine.dispose()
+
     def init_db(self) -> None:
+        # Skip schema setup if stored marker matches current models
+        fingerprint = schema_fingerprint()
+        stored_fingerprint = self._get_schema_fingerprint()
+        if stored_fingerprint == fingerprint:
+            logging.debug(f"Schema {fingerprint[:12]} already initialized.")
+            return
+
         # Create schema if not exists
         inspector = inspect(self.engine)
         schema_exists = inspector.has_schema(SCHEMA_NAME)
@@ -89,9 +156,22 @@ class DatabaseManager:
         Base.metadata.create_all(self.engine)
         logging.debug("Tables created or already exist.")
 
+        # Existing apartments have no image links until legacy table is migrated
+        if inspector.has_table(LEGACY_IMAGES_TABLE, schema=SCHEMA_NAME):
+            logging.warning(f"Legacy table '{SCHEMA_NAME}.{LEGACY_IMAGES_TABLE}' still exists. Run 'python main.py migrate-images' to link its images to apartments.")
+
+        # Store marker
+        self.session.execute(delete(SchemaFingerprintDB))
+        self.session.add(SchemaFingerprintDB(fingerprint=fingerprint))
+        self.session.commit()
+        logging.info(f"Schema updated: {(stored_fingerprint or 'none')[:12]} -> {fingerprint[:12]}.")
+
     def check_apartment_exists(self, url: str) -> bool:
         try:
-            exists = self.session.query(ApartmentDB).filter_by(apurl=url).first() is not None
+            # Short pooled connection (no ORM transaction is kept open between checks)
+            with self.engine.connect() as conn:
+                query = select(ApartmentDB.apartment_id).where(ApartmentDB.apurl == url).limit(1)
+                exists = conn.execute(query).first() is not None
             return exists
         except Exception as e:
             logging.error(f"Error checking if apartment exists: {e}")
@@ -99,9 +179,9 @@ class DatabaseManager:
 
     def save_apartments(self, apartments: List[Dict[str, Any]]) -> None:
         try:
-            for apt in apartments:
-                # Create new apartment record
-                db_apartment = ApartmentDB(
+            # Create new apartment records
+            db_apartments = [
+                ApartmentDB(
                     apurl=apt.get('apurl')
                     , raw_address = apt.get('raw_address')
                     , street = apt.get('street')
@@ -123,25 +203,94 @@ class DatabaseManager:
                     , ownership_form=apt.get('ownership_form')
                     , condition=apt.get('condition')
                 )
+                for apt in apartments
+            ]
+            self.session.add_all(db_apartments)
+            self.session.flush() # assigns apartment_id (needed for image links)
 
-                # Create image records
-                images = apt.get('images', [])
-                if images:
-                    for img_url in images:
-                        db_image = ImageDB(image=img_url)
-                        db_apartment.images.append(db_image) # links image to the apartment
-
-                # Add apartment (and its related iamge objects) to the session
-                self.session.add(db_apartment)
+            # Create image records and links (bulk)
+            image_count = self._save_images(
+                (db_apartment.apartment_id, apt.get('images', []))
+                for db_apartment, apt in zip(db_apartments, apartments)
+            )
 
             # Save all changes to the database (commit transaction)
             self.session.commit()
 
-            logging.info(f"Successfully saved {len(apartments)} apartments to database.")
+            logging.info(f"Successfully saved {len(apartments)} apartments ({image_count} image links) to database.")
         except Exception as e:
             self.session.rollback()
             logging.error(f"Failed to save data to database: {e}")
-        finally:
-            if self._session:
-                self._session.close()
-                self._session = None
+
+    def migrate_legacy_images(self) -> None:
+        """Move rows from legacy 'images' table into 'image_urls' + 'apartment_images'."""
+        inspector = inspect(self.engine)
+        if not inspector.has_table(LEGACY_IMAGES_TABLE, schema=SCHEMA_NAME):
+            logging.info(f"Legacy table '{SCHEMA_NAME}.{LEGACY_IMAGES_TABLE}' not found. Nothing to migrate.")
+            return
+
+        query = text(f"SELECT apartment_id, image FROM {SCHEMA_NAME}.{LEGACY_IMAGES_TABLE} WHERE apartment_id IS NOT NULL ORDER BY apartment_id, id")
+        migrated = 0
+        try:
+            with self.engine.connect() as read_conn:
+                rows = read_conn.execution_options(stream_results=True, yield_per=LEGACY_MIGRATION_CHUNK).execute(query)
+                carry: Dict[int, List[str]] = {}
+                for chunk in rows.partitions():
+                    # Group chunk rows by apartment (order by apartment_id keeps groups together)
+                    grouped = carry
+                    for apartment_id, image in chunk:
+                        grouped.setdefault(apartment_id, []).append(image)
+
+                    # Last apartment may continue in next chunk, so it's saved together with it (keeps positions)
+                    last_apartment_id = chunk[-1][0]
+                    carry = {last_apartment_id: grouped.pop(last_apartment_id)}
+
+                    if grouped:
+                        migrated += self._save_images(grouped.items())
+                        self.session.commit()
+                        logging.info(f"Migrated legacy image rows: {migrated} links so far.")
+
+                if carry:
+                    migrated += self._save_images(carry.items())
+                    self.session.commit()
+
+            logging.info(f"Legacy images migrated ({migrated} links). Table '{SCHEMA_NAME}.{LEGACY_IMAGES_TABLE}' can now be dropped.")
+        except Exception as e:
+            self.session.rollback()
+            logging.error(f"Failed to migrate legacy images: {e}")
+
+
+    # Function helpers
+    def _count(self, counter: str) -> None:
+        self._pool_counters[counter] += 1
+
+    def _get_schema_fingerprint(self) -> Optional[str]:
+        try:
+            with self.engine.connect() as conn:
+                return conn.execute(select(SchemaFingerprintDB.fingerprint)).scalar()
+        except Exception:
+            return None # schema or marker table doesn't exist yet
+
+    def _save_images(self, apartments_images: Iterable[Tuple[int, List[str]]]) -> int:
+        image_rows: Dict[int, str] = {}
+        link_rows: List[Dict[str, Any]] = []
+
+        for apartment_id, images in apartments_images:
+            for position, img_url in enumerate(image_utils.dedupe_image_urls(images or [])):
+                key = image_utils.image_hash(img_url)
+                image_rows.setdefault(key, img_url) # first original URL is stored
+                link_rows.append({'apartment_id': apartment_id, 'image_id': key, 'position': position})
+
+        if not link_rows:
+            return 0
+
+        # Sorted keys keep lock order stable between concurrent writers
+        self.session.execute(
+            pg_insert(ImageDB).on_conflict_do_nothing(index_elements=['image_id'])
+            , [{'image_id': key, 'image': image_rows[key]} for key in sorted(image_rows)]
+        )
+        self.session.execute(
+            pg_insert(ApartmentImageDB).on_conflict_do_nothing(index_elements=['apartment_id', 'image_id'])
+            , link_rows
+        )
+        return len(link_rows)
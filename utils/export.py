@@ -0,0 +1,220 @@
+import re
+import csv
+import json
+import logging
+from pathlib import Path
+from datetime import datetime
+from utils import pipeline, storage
+from typing import List, Dict, Any, Optional, Iterator, Callable, Tuple
+
+# Export settings
+EXPORT_DIR = storage.ROOT_DIR / 'export'
+EXPORT_DATASET = 'apartments'
+EXPORT_CHUNK_SIZE = 50_000 # rows kept in memory at once
+WATERMARK_FILE = '_watermark.json'
+UNKNOWN_PARTITION = '__unknown__'
+
+# Typed export columns (name, type)
+EXPORT_COLUMNS: List[Tuple[str, str]] = [
+    ('apurl', 'string')
+    , ('raw_address', 'string')
+    , ('street', 'string')
+    , ('subdistrict', 'string')
+    , ('district', 'string')
+    , ('city', 'string')
+    , ('parish', 'string')
+    , ('price', 'int')
+    , ('price_per_m2', 'int')
+    , ('rooms', 'int')
+    , ('bedrooms', 'int')
+    , ('total_area', 'float')
+    , ('floor', 'string')
+    , ('built_year', 'int')
+    , ('cadastre_no', 'string')
+    , ('energy_mark', 'string')
+    , ('utilities_summer', 'float')
+    , ('utilities_winter', 'float')
+    , ('ownership_form', 'string')
+    , ('condition', 'string')
+    , ('scraped_at', 'timestamp')
+    , ('updated_at', 'timestamp')
+]
+RECORD_FIELDS = [name for name, _ in EXPORT_COLUMNS if name not in ('scraped_at', 'updated_at')] + ['images'] # scraped record keys
+PARTITION_COLUMNS = ('city',) # stored only in directory names (hive style), not inside files
+FILE_COLUMNS = [(name, col_type) for name, col_type in EXPORT_COLUMNS if name not in PARTITION_COLUMNS]
+
+
+# Main function
+def export_apartments(
+    source: str = 'db'
+    , fmt: str = 'parquet'
+    , output_dir: Path = EXPORT_DIR
+    , incremental: bool = True
+    , chunk_size: int = EXPORT_CHUNK_SIZE
+    , db_manager: Any = None
+) -> int:
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+
+    # Parquet needs optional 'pyarrow' package, plain CSV is used without it
+    if fmt == 'parquet' and not _has_pyarrow():
+        logging.warning("'pyarrow' is not installed. Falling back to CSV export.")
+        fmt = 'csv'
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    watermarks = _load_watermarks(output_dir)
+    since = _parse_timestamp(watermarks.get(source)) if incremental else None
+    logging.info(f"Exporting apartments from {source} to {fmt} ({'changed since ' + str(since) if since else 'full export'})...")
+
+    if source == 'db':
+        records = iter_db_records(db_manager, since, chunk_size)
+    elif source == 'json':
+        records = iter_json_records(since)
+    elif source == 'reparsed':
+        records = iter_json_records(since, storage.REPARSED_DIR) # output of 'python main.py reparse'
+    else:
+        raise ValueError(f"Unknown export source: {source}")
+
+    # Write chunk by chunk (only one chunk is kept in memory)
+    writer = _write_parquet_chunk if fmt == 'parquet' else _write_csv_chunk
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    rows_written = 0
+    max_updated_at = since
+    for chunk_nr, chunk in enumerate(pipeline.chunked(records, chunk_size)):
+        rows = [_to_export_row(record) for record in chunk]
+        _write_partitioned(rows, output_dir / EXPORT_DATASET, f'part-{run_id}-{chunk_nr:05d}', writer)
+
+        # Watermark uses full precision 'updated_at' (exported column is truncated to seconds)
+        rows_written += len(rows)
+        chunk_updated_at = (_parse_timestamp(record.get('updated_at')) for record in chunk)
+        chunk_max = max((updated_at for updated_at in chunk_updated_at if updated_at), default=None)
+        if chunk_max and (max_updated_at is None or chunk_max > max_updated_at):
+            max_updated_at = chunk_max
+        logging.info(f"Exported {rows_written} apartments so far.")
+
+    # Store new watermark (only after all chunks are written)
+    if max_updated_at:
+        watermarks[source] = max_updated_at.isoformat()
+        _save_watermarks(output_dir, watermarks)
+
+    logging.info(f"Export ended. {rows_written} apartments written to {output_dir / EXPORT_DATASET}")
+    return rows_written
+
+
+# Sources
+def iter_db_records(db_manager: Any, since: Optional[datetime], chunk_size: int) -> Iterator[Dict[str, Any]]:
+    from sqlalchemy import select
+    from utils.db import ApartmentDB
+
+    table = ApartmentDB.__table__
+    query = select(table).order_by(table.c.updated_at, table.c.apartment_id)
+    if since is not None:
+        query = query.where(table.c.updated_at > since)
+
+    # Server side cursor, rows are fetched in 'chunk_size' batches
+    with db_manager.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for row in result.mappings():
+            record = dict(row)
+            record['scraped_at'] = record.get('created_at')
+            yield record
+
+def iter_json_records(since: Optional[datetime], directory: Path = storage.DATA_DIR) -> Iterator[Dict[str, Any]]:
+    for file_path in storage.list_data_files(directory):
+        # Records are never newer than their file (file name is set when records are saved or compacted)
+        file_ts = storage.file_timestamp(file_path)
+        if since is not None and file_ts <= since:
+            continue
+
+        for record in storage.iter_json_file(file_path):
+            # Record 'scraped_at' (set by storage.save_to_json) survives compaction, file timestamp is only fallback for old records
+            scraped_at = _parse_timestamp(record.get('scraped_at')) or file_ts
+            if since is not None and scraped_at <= since:
+                continue
+            yield {**record, 'scraped_at': scraped_at, 'updated_at': scraped_at}
+
+
+# Writers
+def _write_partitioned(rows: List[Dict[str, Any]], dataset_dir: Path, part_name: str, writer: Callable[[List[Dict[str, Any]], Path], None]) -> None:
+    # Partitioned by scrape date and city (hive style: scrape_date=.../city=...)
+    partitions: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for row in rows:
+        scrape_date = row['scraped_at'].date().isoformat() if row['scraped_at'] else UNKNOWN_PARTITION
+        partitions.setdefault((scrape_date, _partition_value(row['city'])), []).append(row)
+
+    for (scrape_date, city), partition_rows in partitions.items():
+        partition_dir = dataset_dir / f'scrape_date={scrape_date}' / f'city={city}'
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        file_rows = [{name: row[name] for name, _ in FILE_COLUMNS} for row in partition_rows]
+        writer(file_rows, partition_dir / part_name)
+
+def _write_parquet_chunk(rows: List[Dict[str, Any]], filepath: Path) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pa_types = {'string': pa.string(), 'int': pa.int64(), 'float': pa.float64(), 'timestamp': pa.timestamp('s')}
+    schema = pa.schema([(name, pa_types[col_type]) for name, col_type in FILE_COLUMNS])
+    pq.write_table(pa.Table.from_pylist(rows, schema=schema), filepath.with_suffix('.parquet'))
+
+def _write_csv_chunk(rows: List[Dict[str, Any]], filepath: Path) -> None:
+    with open(filepath.with_suffix('.csv'), 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=[name for name, _ in FILE_COLUMNS])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# Function helpers
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow.parquet # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _to_export_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    converters = {'string': _to_str, 'int': _to_int, 'float': _to_float, 'timestamp': _to_timestamp}
+    return {name: converters[col_type](record.get(name)) for name, col_type in EXPORT_COLUMNS}
+
+def _to_str(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    try:
+        return float(str(value).replace('\xa0', '').replace(' ', '').replace(',', '.'))
+    except ValueError:
+        return None
+
+def _to_int(value: Any) -> Optional[int]:
+    number = _to_float(value)
+    return None if number is None else int(number)
+
+def _to_timestamp(value: Any) -> Optional[datetime]:
+    # Seconds precision, same as Parquet 'timestamp[s]' column and 'scrape_date' partition derived from it
+    timestamp = _parse_timestamp(value)
+    return None if timestamp is None else timestamp.replace(microsecond=0)
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+def _partition_value(value: Optional[str]) -> str:
+    if not value:
+        return UNKNOWN_PARTITION
+    return re.sub(r'[\\/=]', '_', value.strip())
+
+def _load_watermarks(output_dir: Path) -> Dict[str, str]:
+    watermark_path = output_dir / WATERMARK_FILE
+    if not watermark_path.exists():
+        return {}
+    with open(watermark_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def _save_watermarks(output_dir: Path, watermarks: Dict[str, str]) -> None:
+    with open(output_dir / WATERMARK_FILE, 'w', encoding='utf-8') as file:
+        json.dump(watermarks, file, indent=4)
@@ -2,8 +2,10 @@ import time
 import random
 import logging
 import requests
-from typing import Optional
+from config import http as http_config
+from typing import Optional, Dict, Any
 from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse, urljoin
 
@@ -18,11 +20,10 @@ DELAY_MAX = 7.0
 BASE_URL = "https://www.kv.ee"
 REQUEST_HEADERS = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
-    , "Accept-Encoding": "gzip, deflate, br, zstd"
+    , "Accept-Encoding": ACCEPT_ENCODING # only encodings urllib3 can decode ('br'/'zstd' if brotli/zstandard is installed)
     , "Accept-Language": "en-GB,en;q=0.5"
     , "Connection": "keep-alive"
     , "DNT": "1"
-    , "Host": "www.kv.ee"
     , "Priority": "u=0, i"
     , "Sec-Fetch-Dest": "document"
     , "Sec-Fetch-Mode": "navigate"
@@ -41,15 +42,38 @@ def create_session() -> requests.Session:
         , backoff_factor=BACKOFF_FACTOR
         , status_forcelist=RETRY_STATUS_CODES
     )
-    adapter = HTTPAdapter(max_retries=retries)
+    adapter = HTTPAdapter(
+        pool_connections=http_config.pool_connections
+        , pool_maxsize=http_config.pool_maxsize
+        , pool_block=http_config.pool_block
+        , max_retries=retries
+    )
     session.mount("https://", adapter)
 
-    # Return session with configured retry strategy
+    # Return session with configured retry strategy and connection pool
+    logging.debug(f"HTTP session created. Pool: {http_config.pool_maxsize} connections per host (block={http_config.pool_block}). Accept-Encoding: {ACCEPT_ENCODING}.")
     return session
 
-def get_initial_url() -> str:
+def connection_stats(session: requests.Session) -> Dict[str, Any]:
+    """Connection reuse stats of session pools (requests sent vs new sockets opened)."""
+    requests_sent = 0
+    connections_opened = 0
+
+    for adapter in session.adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None: # evicted meanwhile
+                continue
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+
+    reuse_rate = 1 - connections_opened / requests_sent if requests_sent else 0.0
+    return {'requests': requests_sent, 'connections': connections_opened, 'reuse_rate': round(reuse_rate, 3)}
+
+def get_initial_url(url: Optional[str] = None) -> str:
     default_url = f"{BASE_URL}/en/search?deal_type=1"
-    user_input = input(f"Enter initial URL (default: {default_url}): ").strip()
+    user_input = url.strip() if url is not None else input(f"Enter initial URL (default: {default_url}): ").strip()
 
     if not user_input:
         logging.info(f"No input provided. Defaulting to: {default_url}")
@@ -0,0 +1,44 @@
+import re
+import hashlib
+from typing import List, Dict, Iterable
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+# Size variants KV.ee (and agency CDNs) put into image URLs, e.g.
+# '.../640x480/12345.jpg', '.../thumb/12345.jpg', '.../12345_640x480.jpg', '...?id=12345&w=640'
+# Used only for the dedupe key, stored URLs are never rewritten
+SIZE_SEGMENT_RE = re.compile(r"^(\d{2,4}x\d{2,4}|thumb|thumbs|small|medium|large|big|orig|original)$", re.IGNORECASE)
+SIZE_SUFFIX_RE = re.compile(r"[_-](\d{2,4}x\d{2,4}|thumb|small|medium|large|big)(?=\.[a-z0-9]+$)", re.IGNORECASE)
+SIZE_QUERY_PARAMS = {'w', 'h', 'width', 'height', 'size', 'q', 'quality', 'fit', 'format', 'fm', 'dpr', 'auto', 'resize'}
+
+
+def canonical_image_url(url: str) -> str:
+    """Return dedupe key form of image URL (https, lowercase host, no size variants or size/format query params)."""
+    url = url.strip()
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in ('http', 'https', ''):
+        return url # e.g. 'data:' URIs are kept as they are
+
+    # Drop size-only path segments and size suffixes in file name
+    segments = [segment for segment in parts.path.split('/') if segment and not SIZE_SEGMENT_RE.match(segment)]
+    if segments:
+        segments[-1] = SIZE_SUFFIX_RE.sub('', segments[-1])
+    path = '/' + '/'.join(segments)
+
+    # Keep query params that identify the image (e.g. 'id'), drop only size/format ones
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key.lower() not in SIZE_QUERY_PARAMS)
+
+    return urlunsplit(('https', parts.netloc.lower(), path, urlencode(query), ''))
+
+def dedupe_image_urls(urls: Iterable[str]) -> List[str]:
+    """Remove size/format variants of the same image. Keeps first original URL of each image (and order)."""
+    unique: Dict[str, str] = {}
+    for url in urls:
+        if url and url.strip():
+            unique.setdefault(canonical_image_url(url), url.strip())
+    return list(unique.values())
+
+def image_hash(url: str) -> int:
+    """Stable signed 64-bit key of image URL canonical form (fits PostgreSQL BIGINT)."""
+    digest = hashlib.blake2b(canonical_image_url(url).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, byteorder='big', signed=True)
@@ -2,10 +2,9 @@ import logging
 from pathlib import Path
 from datetime import datetime
 
-# Create 'logs' directory if it doesn't exist
+# 'logs' directory is created on first setup_logger() call
 ROOT_DIR = Path(__file__).resolve().parent.parent
 LOGS_DIR = ROOT_DIR / 'logs'
-LOGS_DIR.mkdir(exist_ok=True)
 
 # Logging settings
 LOG_LEVEL = logging.INFO
@@ -30,6 +29,7 @@ def cleanup_logs() -> None:
 
 def setup_logger() -> logging.Logger:
     """Setup logger with file and console handlers."""
+    LOGS_DIR.mkdir(exist_ok=True) # create 'logs' directory if it doesn't exist
     cleanup_logs() # clean up old logs before creating new one
 
     log_file = LOGS_DIR / f'{datetime.now().strftime("%Y%m%d%H%M%S")}.log'
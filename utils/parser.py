@@ -1,11 +1,13 @@
 import logging
 from lxml import html
 from config import xpaths
-from typing import Optional, Dict, List, Any
-from requests.adapters import Response
+from typing import Optional, Dict, List, Any, TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from requests import Response # only for type hints (keeps 'requests' out of reparse)
 
-def parse_response(response: Response) -> Optional[html.HtmlElement]:
+
+def parse_response(response: 'Response') -> Optional[html.HtmlElement]:
     try:
         logging.debug(f"Parsing HTML from received response. Response URL: {response.url}")
         decoded_content = response.content.decode('utf-8', errors='ignore')
@@ -79,6 +81,14 @@ def extract_apartment_data(html: html.HtmlElement, url: str) -> Dict[str, Any]:
 
     return data
 
+def reparse_apartment(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Re-derive address fields from stored raw_address (no HTTP request needed). Raw images are kept."""
+    if data.get('raw_address'):
+        for key in ('street', 'district', 'subdistrict', 'city', 'parish'):
+            data[key] = None
+        _split_address(data['raw_address'], data)
+    return data
+
 
 def _parse_address(html: html.HtmlElement, data: Dict[str, Any]) -> None:
     address = extract_element(html, xpaths.APARTMENT_ADDRESS)
@@ -94,6 +104,9 @@ def _parse_address(html: html.HtmlElement, data: Dict[str, Any]) -> None:
 
     full_address = address_parts[1] # example: 'street, distinct, city...'
     data['raw_address'] = full_address # fill data dictionary with raw_address
+    _split_address(full_address, data)
+
+def _split_address(full_address: str, data: Dict[str, Any]) -> None:
     splitted_full_address = [part.strip() for part in full_address.split(",")] # example: ['street', 'distinct', 'city', ...]
     num_parts = len(splitted_full_address)
 
@@ -151,7 +164,7 @@ def _parse_images(html: html.HtmlElement, data: Dict[str, Any]) -> None:
     if not images:
         logging.debug("Images not found. Fields remains as empty list.")
         return
-    data['images'] = images
+    data['images'] = images # raw URLs (deduplicated only when saved to database)
 
 def _parse_table_fields(html: html.HtmlElement, data: Dict[str, Any]) -> None:
     fields = {
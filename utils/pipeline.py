@@ -0,0 +1,62 @@
+import logging
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Callable, Sequence
+
+# Pipeline settings
+PIPELINE_CHUNK_SIZE = 50 # records kept in memory before they are handed to sinks (~1 search page)
+
+# Record flow: records -> stages (filter/transform) -> sinks (in chunks)
+Record = Dict[str, Any]
+Stage = Callable[[Record], Optional[Record]] # returns None to drop the record
+Sink = Callable[[List[Record]], None] # e.g. storage.save_to_json, DatabaseManager.save_apartments
+
+
+def run(records: Iterable[Record], sinks: Sequence[Sink], stages: Sequence[Stage] = (), chunk_size: int = PIPELINE_CHUNK_SIZE) -> int:
+    """Consume records through stages into sinks, keeping at most 'chunk_size' records in memory."""
+    buffer: List[Record] = []
+    saved_count = 0
+
+    try:
+        for record in apply_stages(records, stages):
+            buffer.append(record)
+            if len(buffer) >= chunk_size:
+                # Swap buffer out first, so a failing sink doesn't make 'finally' save the same records again
+                chunk, buffer = buffer, []
+                _flush(chunk, sinks)
+                saved_count += len(chunk)
+    finally:
+        # Records not yet handed to sinks are saved even if producer failed or was interrupted
+        if buffer:
+            _flush(buffer, sinks)
+            saved_count += len(buffer)
+
+    return saved_count
+
+def apply_stages(records: Iterable[Record], stages: Sequence[Stage]) -> Iterator[Record]:
+    for record in records:
+        for stage in stages:
+            record = stage(record)
+            if record is None:
+                break
+        else:
+            yield record
+
+def chunked(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    iterator = iter(records)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def require_fields(*fields: str) -> Stage:
+    """Stage that drops records where any of given fields is empty."""
+    def stage(record: Record) -> Optional[Record]:
+        if all(record.get(field) not in (None, '', []) for field in fields):
+            return record
+        logging.debug(f"Record dropped (missing one of {fields}): {record.get('apurl')}")
+        return None
+    return stage
+
+
+def _flush(buffer: List[Record], sinks: Sequence[Sink]) -> None:
+    logging.info(f"Saving {len(buffer)} apartments...")
+    for sink in sinks:
+        sink(buffer)
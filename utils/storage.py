@@ -1,21 +1,29 @@
 import os
+import re
 import json
-import glob
 import logging
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterable, Iterator, TextIO
 
-# Create 'data' directory if it doesn't exist
+# 'data' directory is created on first write
 ROOT_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT_DIR / 'data'
-DATA_DIR.mkdir(exist_ok=True)
+REPARSED_DIR = DATA_DIR / 'reparsed' # reparse output, originals in DATA_DIR are never overwritten
+FILENAME_TS_RE = re.compile(r"__(\d{14})\.jsonl?$")
+JSON_READ_SIZE = 1 << 16 # characters read at once when streaming JSON arrays
 
 
 def save_to_json(apartments: List[Dict[str, Any]]) -> None:
-    filename = f'apartments__{datetime.now().strftime("%Y%m%d%H%M%S")}.json'
+    DATA_DIR.mkdir(exist_ok=True) # create 'data' directory if it doesn't exist
+    now = datetime.now().replace(microsecond=0)
+    filename = f'apartments__{now.strftime("%Y%m%d%H%M%S")}.json'
     filepath = DATA_DIR / filename
 
+    # Every record carries its own scrape timestamp (file names change on compaction)
+    for apt in apartments:
+        apt.setdefault('scraped_at', now.isoformat())
+
     try:
         with open(filepath, 'w', encoding='utf-8') as file:
             json.dump(apartments, file, ensure_ascii=False, indent=4)
@@ -24,31 +32,108 @@ def save_to_json(apartments: List[Dict[str, Any]]) -> None:
     except Exception as e:
         logging.error(f"Failed to save data to {filepath}: {e}")
 
-def _combine_json_files() -> None:
-    filename = f'combined_apartments__{datetime.now().strftime("%Y%m%d%H%M%S")}.json'
-    output_filepath = DATA_DIR / filename
+def list_data_files(directory: Path = DATA_DIR) -> List[Path]:
+    if not directory.exists():
+        return []
+    return sorted([*directory.glob("*.json"), *directory.glob("*.jsonl")])
+
+def iter_json_file(filepath: Path) -> Iterator[Dict[str, Any]]:
+    # Records are streamed one by one, so even big combined files are read in bounded memory
+    with open(filepath, 'r', encoding='utf-8') as file:
+        if filepath.suffix == '.jsonl':
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(file)
+
+def write_jsonl(filepath: Path, apartments: Iterable[Dict[str, Any]]) -> int:
+    # Write to temporary file first, so interrupted write doesn't leave half-written file
+    tmp_filepath = filepath.with_suffix('.jsonl.tmp')
+    count = 0
+    with open(tmp_filepath, 'w', encoding='utf-8') as file:
+        for apt in apartments:
+            file.write(json.dumps(apt, ensure_ascii=False) + '\n')
+            count += 1
+    os.replace(tmp_filepath, filepath)
+    return count
 
-    # Combine
-    json_files = glob.glob(os.path.join(DATA_DIR, "*.json"))
-    combined_data = []
-    for file_path in json_files:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            combined_data.extend(data)
+def compact_json_files() -> Optional[Path]:
+    data_files = list_data_files()
+    if len(data_files) <= 1:
+        logging.info(f"Found {len(data_files)} JSON files in {DATA_DIR}. Nothing to compact.")
+        return None
 
+    filename = f'combined_apartments__{datetime.now().strftime("%Y%m%d%H%M%S")}.jsonl'
+    output_filepath = DATA_DIR / filename
 
-    # Write
-    with open(output_filepath, 'w', encoding='utf-8') as file:
-        json.dump(combined_data, file, ensure_ascii=False, indent=4)
+    # Combine and write (streamed as JSONL, records keep their 'scraped_at')
+    records = (apt for file_path in data_files for apt in _with_scraped_at(iter_json_file(file_path), file_path))
+    records_count = write_jsonl(output_filepath, records)
 
 
     # Remove
     files_removed = 0
-    for file_path in json_files:
+    for file_path in data_files:
         if file_path != output_filepath:
             os.remove(file_path)
             files_removed += 1
 
+    logging.info(f"Combined {records_count} apartments from {files_removed} files into {output_filepath}")
+    return output_filepath
+
+def file_timestamp(filepath: Path) -> datetime:
+    # Timestamp from file name ('apartments__yyyymmddhhmmss.json'), file modification time otherwise
+    match = FILENAME_TS_RE.search(filepath.name)
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d%H%M%S")
+    return datetime.fromtimestamp(filepath.stat().st_mtime).replace(microsecond=0)
+
+
+def _with_scraped_at(apartments: Iterable[Dict[str, Any]], filepath: Path) -> Iterator[Dict[str, Any]]:
+    # Records saved before 'scraped_at' was added get timestamp of their source file
+    scraped_at = file_timestamp(filepath).isoformat()
+    for apt in apartments:
+        apt.setdefault('scraped_at', scraped_at)
+        yield apt
+
+def _iter_json_array(file: TextIO) -> Iterator[Dict[str, Any]]:
+    # Incremental parser for '[{...}, {...}]' files, reads JSON_READ_SIZE characters at a time
+    decoder = json.JSONDecoder()
+    buffer, pos, started = '', 0, False
+    while True:
+        chunk = file.read(JSON_READ_SIZE)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+        while True:
+            # Skip whitespace and separators between records
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buffer):
+                break
+
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError(f"Expected JSON array in {file.name}")
+                started = True
+                pos += 1
+                continue
+
+            if buffer[pos] == ']':
+                return
+
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break # record continues in next chunk
+            yield record
+
+        if not chunk:
+            if started:
+                raise ValueError(f"Unexpected end of JSON array in {file.name}")
+            return # empty file
+
 
 if __name__ == "__main__":
-    _combine_json_files()
+    compact_json_files()